@@ -1,12 +1,20 @@
+import asyncio
+import atexit
+from collections import Counter, deque
+from contextlib import nullcontext
+import aiohttp
 import requests
-from bs4 import BeautifulSoup
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from xml.sax.saxutils import escape
+from lxml import etree, html
+import hashlib
+import heapq
+import orjson
 import csv
 from datetime import datetime
-from urllib.parse import urljoin, urlparse
-import time
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlparse
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
@@ -14,236 +22,811 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_LEFT, TA_CENTER
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import threading
+import time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+
+try:
+    from blake3 import blake3
+except ImportError:  # Page fingerprints fall back to hashlib's BLAKE2
+    blake3 = None
+
+# Configure logging: callers only enqueue records, and a background
+# listener thread does the formatting and file/console I/O
+_log_queue = queue.SimpleQueue()
+_log_handlers = [
+    logging.FileHandler('crawler.log'),
+    logging.StreamHandler()
+]
+for _handler in _log_handlers:
+    _handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+_root_logger = logging.getLogger()
+_root_logger.setLevel(logging.INFO)
+_root_logger.addHandler(QueueHandler(_log_queue))
+
+_log_listener = QueueListener(_log_queue, *_log_handlers)
+_log_listener.start()
+atexit.register(_log_listener.stop)  # Flush queued records before the interpreter exits
+
+# Letters-only words; digits are dropped so dates and counters don't affect fingerprints
+_WORD_RE = re.compile(r'[^\W\d_]+')
+
+# Site-specific extractors keyed by domain (without "www."). Each is called as
+# extractor(tree, url) with the parsed lxml document and returns a dict of record
+# fields (see WebCrawler.RECORD_FIELDS). Fields it leaves out are filled in by the
+# generic extraction; an extractor returning every field skips that walk entirely.
+# A partial extractor therefore runs on top of the generic walk and adds to the
+# parse time, so it should read the DOM in as few passes as possible.
+EXTRACTORS = {}
+
+
+def register_extractor(domain):
+    """Decorator registering a specialized extractor for pages on domain and its subdomains"""
+    def decorator(func):
+        EXTRACTORS[domain.lower().removeprefix('www.')] = func
+        return func
+    return decorator
+
+
+def find_extractor(url):
+    """Return the registered extractor for the URL's host or nearest parent domain, if any"""
+    if not EXTRACTORS:
+        return None
+    
+    try:
+        host = (urlparse(url).hostname or '').removeprefix('www.')
+    except ValueError:
+        return None
+    while host:
+        extractor = EXTRACTORS.get(host)
+        if extractor is not None:
+            return extractor
+        host = host.partition('.')[2]
+    return None
+
+
+_XP_CITATION = etree.XPath('//meta[starts-with(@name, "citation_")]')
+
+
+@register_extractor('arxiv.org')
+def extract_arxiv(tree, url):
+    """arXiv abstract pages: paper metadata from the Highwire Press citation_* tags
+
+    The generic title/description are the "[id] Title" page title and a truncated
+    abstract, and only one author is picked up; citation tags carry the full data.
+    """
+    # Every citation tag in one pass, grouped by name in document order
+    citations = {}
+    for meta in _XP_CITATION(tree):
+        value = (meta.get('content') or '').strip()
+        if value:
+            citations.setdefault(meta.get('name'), []).append(value)
+    
+    fields = {}
+    for field, name in (('title', 'citation_title'),
+                        ('description', 'citation_abstract'),
+                        ('publish_date', 'citation_date')):
+        if name in citations:
+            fields[field] = citations[name][0]
+    
+    if 'citation_author' in citations:
+        fields['author'] = '; '.join(citations['citation_author'])
+    return fields
+
+
+class PageRejectedError(Exception):
+    """Raised when a response is not HTML or exceeds the page size cap"""
+
+
+class _KeptElement:
+    """Childless stand-in for an lxml element, exposing only what the collectors read
+
+    Plain strings are kept as-is, so text and attributes containing control
+    characters (which lxml refuses to put back into an element) survive the
+    streaming path exactly as they do in the DOM path.
+    """
+    
+    __slots__ = ('tag', 'attrib', 'text')
+    
+    def __init__(self, tag, attrib, text):
+        self.tag = tag
+        self.attrib = attrib
+        self.text = text
+    
+    def __len__(self):
+        return 0
+    
+    def get(self, key, default=None):
+        return self.attrib.get(key, default)
+    
+    def text_content(self):
+        return self.text
+
+
+class _MetadataTarget:
+    """lxml parser target that rebuilds only the elements WebCrawler collects
+
+    Every other element is dropped as soon as its events fire, so memory is
+    bounded by what is kept rather than by the size of the document.
+    """
+    
+    # Attributes the collectors read; the rest are never copied
+    KEPT_ATTRIBUTES = ('name', 'property', 'itemprop', 'content', 'rel', 'href',
+                       'src', 'alt', 'title', 'type')
+    
+    def __init__(self, crawler, page):
+        self.crawler = crawler
+        self.page = page
+        self.collectors = crawler._COLLECTORS
+        self.open = []  # (tag, attributes, text chunks) of collected elements not yet closed
+        self.in_body = False
+        self.hidden_depth = 0  # Nesting inside <script>/<style>, whose text is not visible
+    
+    def start(self, tag, attrib):
+        if tag == 'html' and not self.page['language']:
+            self.page['language'] = attrib.get('lang', '')
+        elif tag == 'body':
+            self.in_body = True
+        if tag in ('script', 'style'):
+            self.hidden_depth += 1
+        if tag in self.collectors:
+            kept = {k: attrib[k] for k in self.KEPT_ATTRIBUTES if k in attrib}
+            self.open.append((tag, kept, []))
+    
+    def data(self, data):
+        for _, _, chunks in self.open:
+            chunks.append(data)
+        if self.in_body and not self.hidden_depth:
+            self.page['body_text'].append(data)
+    
+    def end(self, tag):
+        if tag in ('script', 'style') and self.hidden_depth:
+            self.hidden_depth -= 1
+        if self.open and self.open[-1][0] == tag:
+            tag, attrib, chunks = self.open.pop()
+            el = _KeptElement(tag, attrib, ''.join(chunks))
+            self.collectors[tag](self.crawler, el, self.page)
+    
+    def close(self):
+        return self.page
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('crawler.log'),
-        logging.StreamHandler()
-    ]
-)
 
 class WebCrawler:
     """Advanced web crawler for extracting metadata from publisher websites"""
     
-    def __init__(self, max_workers=10, timeout=30, delay=1):
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    }
+    
+    HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+    
+    # Metadata fields of a scraped record, in output order
+    RECORD_FIELDS = ('title', 'description', 'keywords', 'author', 'publish_date', 'og_data',
+                     'twitter_data', 'canonical_url', 'language', 'headings', 'links',
+                     'images', 'schema_org')
+    
+    # Only the first links/images of each page are kept
+    MAX_LINKS = 50
+    MAX_IMAGES = 20
+    
+    # Pages larger than this are parsed with a streaming parser target instead of a DOM
+    STREAMING_PARSE_SIZE = 1024 * 1024
+    
+    # Visible body text used for near-duplicate fingerprinting
+    _XP_BODY_TEXT = etree.XPath('//body//text()[not(ancestor::script) and not(ancestor::style)]')
+    
+    # SimHash near-duplicate settings: pages within SIMHASH_DISTANCE bits are duplicates.
+    # Splitting the 64-bit hash into SIMHASH_DISTANCE + 1 bands guarantees that any such
+    # pair shares at least one band exactly, so only that bucket needs to be compared.
+    SIMHASH_DISTANCE = 3
+    SIMHASH_BANDS = SIMHASH_DISTANCE + 1
+    
+    # Pages with less visible text than this (JS app shells, "Loading..." stubs) are
+    # too generic to fingerprint and are never treated as near-duplicates
+    SIMHASH_MIN_SHINGLES = 32
+    
+    def __init__(self, max_workers=10, timeout=30, delay=1, max_page_size=5 * 1024 * 1024):
         self.max_workers = max_workers
         self.timeout = timeout
         self.delay = delay
+        self.max_page_size = max_page_size
+        
+        # Fingerprints of pages already parsed, shared by all parser threads
+        self._seen_lock = threading.Lock()
+        self._reset_seen()
+        
+        # Earliest time (time.monotonic) each host may be requested again
+        self._host_next_ok = {}
+        self._host_lock = threading.Lock()
+        
         self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        self.session.headers.update(self.HEADERS)
+        
+        # Keep enough pooled keep-alive connections for every worker to reuse
+        adapter = HTTPAdapter(
+            pool_connections=self.max_workers,
+            pool_maxsize=self.max_workers * 2,
+            max_retries=Retry(total=2, backoff_factor=0.3)
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         
     def extract_metadata(self, url):
         """Extract comprehensive metadata from a webpage"""
         try:
-            response = self.session.get(url, timeout=self.timeout)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            time.sleep(self._host_delay(url))  # Rate limiting
+            with self.session.get(url, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                content_type = response.headers.get('Content-Type', '')
+                self._check_response(content_type, response.headers.get('Content-Length'))
+                # Read one byte past the cap so oversized bodies can be detected
+                content = response.raw.read(self.max_page_size + 1, decode_content=True)
+                self._check_size(len(content))
             
-            metadata = {
-                'url': url,
-                'title': self._get_title(soup),
-                'description': self._get_description(soup),
-                'keywords': self._get_keywords(soup),
-                'author': self._get_author(soup),
-                'publish_date': self._get_publish_date(soup),
-                'og_data': self._get_open_graph(soup),
-                'twitter_data': self._get_twitter_card(soup),
-                'canonical_url': self._get_canonical(soup),
-                'language': self._get_language(soup),
-                'headings': self._get_headings(soup),
-                'links': self._get_links(soup, url),
-                'images': self._get_images(soup, url),
-                'schema_org': self._get_schema_org(soup),
-                'status_code': response.status_code,
-                'content_type': response.headers.get('Content-Type', ''),
-                'scraped_at': datetime.now().isoformat()
-            }
+            metadata = self._parse_metadata(url, content, response.status_code, content_type)
             
             logging.info(f"Successfully scraped: {url}")
             return metadata
             
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, PageRejectedError) as e:
             logging.error(f"Error scraping {url}: {str(e)}")
-            return {
-                'url': url,
-                'error': str(e),
-                'scraped_at': datetime.now().isoformat()
-            }
-    
-    def _get_title(self, soup):
-        """Extract page title"""
-        title = soup.find('title')
-        if title:
-            return title.get_text().strip()
-        
-        og_title = soup.find('meta', property='og:title')
-        if og_title:
-            return og_title.get('content', '').strip()
-        
-        return 'No title found'
-    
-    def _get_description(self, soup):
-        """Extract meta description"""
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        if meta_desc:
-            return meta_desc.get('content', '').strip()
-        
-        og_desc = soup.find('meta', property='og:description')
-        if og_desc:
-            return og_desc.get('content', '').strip()
-        
-        return 'No description found'
-    
-    def _get_keywords(self, soup):
-        """Extract meta keywords"""
-        meta_keywords = soup.find('meta', attrs={'name': 'keywords'})
-        if meta_keywords:
-            return meta_keywords.get('content', '').strip()
-        return ''
-    
-    def _get_author(self, soup):
-        """Extract author information"""
-        author = soup.find('meta', attrs={'name': 'author'})
-        if author:
-            return author.get('content', '').strip()
-        
-        article_author = soup.find('meta', property='article:author')
-        if article_author:
-            return article_author.get('content', '').strip()
-        
-        return ''
-    
-    def _get_publish_date(self, soup):
-        """Extract publication date"""
-        date_patterns = [
-            {'property': 'article:published_time'},
-            {'name': 'pubdate'},
-            {'name': 'publishdate'},
-            {'itemprop': 'datePublished'}
+            return self._error_record(url, e)
+    
+    def _host_key(self, url):
+        """Lower-cased host name of the URL, or '' if it cannot be parsed"""
+        try:
+            return urlparse(url).hostname or ''
+        except ValueError:
+            return ''
+    
+    def _host_delay(self, url):
+        """Reserve the next request slot for the URL's host and return how long to wait for it"""
+        host = self._host_key(url)
+        with self._host_lock:
+            now = time.monotonic()
+            next_ok = max(now, self._host_next_ok.get(host, now))
+            self._host_next_ok[host] = next_ok + self.delay
+        return next_ok - now
+    
+    def _check_response(self, content_type, content_length):
+        """Reject non-HTML responses and bodies announced as too large before reading them"""
+        mime_type = content_type.split(';')[0].strip().lower()
+        if mime_type and mime_type not in self.HTML_CONTENT_TYPES:
+            raise PageRejectedError(f"Unsupported content type: {mime_type}")
+        if content_length and content_length.isdigit():
+            self._check_size(int(content_length))
+    
+    def _check_size(self, size):
+        """Reject bodies larger than max_page_size"""
+        if size > self.max_page_size:
+            raise PageRejectedError(f"Page exceeds {self.max_page_size} bytes")
+    
+    def _parse_metadata(self, url, content, status_code, content_type):
+        """Build the metadata record from a fetched page body"""
+        duplicate_of = self._seen_digest(url, self._content_digest(content))
+        if duplicate_of:
+            return self._duplicate_record(url, duplicate_of, status_code, content_type)
+        
+        # Site extractors query the DOM, so their pages are never streamed
+        extractor = find_extractor(url)
+        if extractor is None and len(content) > self.STREAMING_PARSE_SIZE:
+            # Huge page: collect everything in one streaming pass without building a DOM
+            tree = None
+            page = self._collect_streaming(content, content_type, url)
+            body_text = page['body_text']
+            identity = (page['title'], page['canonical'])
+        else:
+            tree = self._parse_tree(content, content_type)
+            page = None
+            body_text = self._XP_BODY_TEXT(tree)
+            identity = self._identity(tree, url)
+        
+        duplicate_of = self._seen_simhash(url, self._simhash(body_text), identity)
+        if duplicate_of:
+            return self._duplicate_record(url, duplicate_of, status_code, content_type)
+        
+        fields = extractor(tree, url) if extractor is not None else {}
+        if any(field not in fields for field in self.RECORD_FIELDS):
+            # Whatever the site extractor didn't provide comes from the generic walk
+            if page is None:
+                page = self._collect(tree, url)
+            fields = {**self._record_fields(page), **fields}
+        
+        return {
+            'url': url,
+            **{field: fields[field] for field in self.RECORD_FIELDS},
+            'status_code': status_code,
+            'content_type': content_type,
+            'scraped_at': datetime.now()
+        }
+    
+    def _record_fields(self, page):
+        """Resolve the collected buckets into the record's metadata fields"""
+        meta_name = page['meta_name']
+        meta_property = page['meta_property']
+        meta_itemprop = page['meta_itemprop']
+        
+        return {
+            'title': page['title'] or meta_property.get('og:title') or 'No title found',
+            'description': (meta_name.get('description')
+                            or meta_property.get('og:description')
+                            or 'No description found'),
+            'keywords': meta_name.get('keywords', ''),
+            'author': meta_name.get('author') or meta_property.get('article:author', ''),
+            'publish_date': (meta_property.get('article:published_time')
+                             or meta_name.get('pubdate')
+                             or meta_name.get('publishdate')
+                             or meta_itemprop.get('datePublished', '')),
+            'og_data': {k: v for k, v in meta_property.items() if k.startswith('og:')},
+            'twitter_data': {k: v for k, v in meta_name.items() if k.startswith('twitter:')},
+            'canonical_url': page['canonical'],
+            'language': page['language'],
+            'headings': page['headings'],
+            'links': page['links'],
+            'images': page['images'],
+            'schema_org': page['schema_org'],
+        }
+    
+    def _charset(self, content_type):
+        """Charset declared in the Content-Type header, or None"""
+        charset = content_type.partition('charset=')[2].split(';')[0].strip(' "\'')
+        return charset or None
+    
+    def _parse_tree(self, content, content_type):
+        """Parse the page body into an lxml document"""
+        # Prefer the charset from the HTTP header; otherwise libxml2 sniffs <meta charset>
+        try:
+            parser = html.HTMLParser(encoding=self._charset(content_type))
+        except LookupError:
+            parser = None
+        
+        try:
+            return html.document_fromstring(content, parser=parser)
+        except etree.ParserError:
+            # Empty or whitespace-only body
+            return html.document_fromstring('<html></html>')
+    
+    def _content_digest(self, content):
+        """Fingerprint the raw page body for exact duplicate detection"""
+        # BLAKE3 is SIMD-accelerated and several times faster on large bodies
+        if blake3 is not None:
+            return blake3(content).digest()[:16]
+        return hashlib.blake2b(content, digest_size=16).digest()
+    
+    def _reset_seen(self):
+        """Forget the fingerprints of previously parsed pages"""
+        with self._seen_lock:
+            self._seen_digests = {}
+            self._simhash_buckets = {}
+    
+    def _seen_digest(self, url, digest):
+        """Return another URL already seen with this body, recording it if new"""
+        with self._seen_lock:
+            seen_url = self._seen_digests.setdefault(digest, url)
+        return seen_url if seen_url != url else None
+    
+    def _simhash(self, body_text):
+        """64-bit SimHash over 3-word shingles of the visible text, or None if there is too little"""
+        text = ' '.join(body_text).lower()
+        tokens = _WORD_RE.findall(text)
+        shingles = {' '.join(tokens[i:i + 3]) for i in range(len(tokens) - 2)}
+        if len(shingles) < self.SIMHASH_MIN_SHINGLES:
+            return None
+        
+        digests = b''.join(
+            hashlib.blake2b(shingle.encode(), digest_size=8).digest() for shingle in shingles
+        )
+        
+        # Count set bits per position in one pass: tally each byte position's values
+        # in C, then expand the (at most 256) distinct values of each into bit counts
+        threshold = len(shingles) / 2
+        simhash = 0
+        for position in range(8):
+            bit_counts = [0] * 8
+            for value, count in Counter(digests[position::8]).items():
+                for bit in range(8):
+                    if value >> bit & 1:
+                        bit_counts[bit] += count
+            for bit, bit_count in enumerate(bit_counts):
+                if bit_count > threshold:
+                    simhash |= 1 << ((7 - position) * 8 + bit)
+        return simhash
+    
+    def _identity(self, tree, url):
+        """Title and canonical URL of a page, collected without the full walk"""
+        page = self._new_page(url)
+        for el in tree.iter('title', 'link'):
+            self._COLLECTORS[el.tag](self, el, page)
+        return page['title'], page['canonical']
+    
+    def _seen_simhash(self, url, simhash, identity):
+        """Return another URL on the same host with near-identical text and identity, recording this one if new"""
+        if simhash is None:
+            return None
+        
+        # Buckets are per host: mirrors and session-id variants live on the same
+        # site, while similar boilerplate on different sites is not duplication.
+        # A shared site template can outweigh a short article in the fingerprint,
+        # so the identity must agree too before two distinct pages are merged.
+        host = self._host_key(url)
+        band_bits = 64 // self.SIMHASH_BANDS
+        band_mask = (1 << band_bits) - 1
+        keys = [
+            (host, band, (simhash >> (band * band_bits)) & band_mask)
+            for band in range(self.SIMHASH_BANDS)
         ]
         
-        for pattern in date_patterns:
-            date_tag = soup.find('meta', attrs=pattern)
-            if date_tag:
-                return date_tag.get('content', '').strip()
-        
-        return ''
-    
-    def _get_open_graph(self, soup):
-        """Extract Open Graph metadata"""
-        og_data = {}
-        og_tags = soup.find_all('meta', property=re.compile(r'^og:'))
-        
-        for tag in og_tags:
-            prop = tag.get('property', '')
-            content = tag.get('content', '')
-            if prop and content:
-                og_data[prop] = content
-        
-        return og_data
-    
-    def _get_twitter_card(self, soup):
-        """Extract Twitter Card metadata"""
-        twitter_data = {}
-        twitter_tags = soup.find_all('meta', attrs={'name': re.compile(r'^twitter:')})
-        
-        for tag in twitter_tags:
-            name = tag.get('name', '')
-            content = tag.get('content', '')
-            if name and content:
-                twitter_data[name] = content
-        
-        return twitter_data
-    
-    def _get_canonical(self, soup):
-        """Extract canonical URL"""
-        canonical = soup.find('link', rel='canonical')
-        if canonical:
-            return canonical.get('href', '')
-        return ''
-    
-    def _get_language(self, soup):
-        """Extract page language"""
-        html_tag = soup.find('html')
-        if html_tag:
-            return html_tag.get('lang', '')
-        return ''
-    
-    def _get_headings(self, soup):
-        """Extract all headings (H1-H6)"""
-        headings = {}
-        for i in range(1, 7):
-            h_tags = soup.find_all(f'h{i}')
-            headings[f'h{i}'] = [h.get_text().strip() for h in h_tags if h.get_text().strip()]
-        return headings
-    
-    def _get_links(self, soup, base_url):
-        """Extract all links"""
-        links = []
-        for link in soup.find_all('a', href=True):
-            href = link.get('href')
-            absolute_url = urljoin(base_url, href)
-            links.append({
-                'text': link.get_text().strip(),
-                'url': absolute_url
+        with self._seen_lock:
+            for key in keys:
+                for other_hash, other_url, other_identity in self._simhash_buckets.get(key, ()):
+                    if (other_url != url and other_identity == identity
+                            and bin(simhash ^ other_hash).count('1') <= self.SIMHASH_DISTANCE):
+                        return other_url
+            for key in keys:
+                self._simhash_buckets.setdefault(key, []).append((simhash, url, identity))
+        return None
+    
+    def _duplicate_record(self, url, duplicate_of, status_code, content_type):
+        """Build the stub record stored for a page whose content was already scraped"""
+        logging.info(f"Skipping duplicate: {url} (same content as {duplicate_of})")
+        return {
+            'url': url,
+            'duplicate_of': duplicate_of,
+            'status_code': status_code,
+            'content_type': content_type,
+            'scraped_at': datetime.now()
+        }
+    
+    def _error_record(self, url, error):
+        """Build the record stored for a URL that could not be scraped"""
+        return {
+            'url': url,
+            'error': str(error) or type(error).__name__,
+            'scraped_at': datetime.now()
+        }
+    
+    def _new_page(self, base_url):
+        """Empty buckets filled in by the collectors"""
+        return {
+            'title': None,
+            'language': '',
+            'meta_name': {},
+            'meta_property': {},
+            'meta_itemprop': {},
+            'canonical': '',
+            'headings': {f'h{i}': [] for i in range(1, 7)},
+            'links': [],
+            'images': [],
+            'schema_org': [],
+            'base_url': base_url,
+        }
+    
+    def _collect(self, tree, base_url):
+        """Walk the document once, bucketing every element the record needs"""
+        page = self._new_page(base_url)
+        page['language'] = tree.get('lang', '')
+        
+        # Filtering by tag inside libxml2 means the loop only ever sees the
+        # elements a collector wants, never the surrounding div/span/p noise
+        collectors = self._COLLECTORS
+        for el in tree.iter(*collectors):
+            collectors[el.tag](self, el, page)
+        
+        return page
+    
+    def _collect_streaming(self, content, content_type, base_url):
+        """Fill the same buckets as _collect from parser events, without building a DOM"""
+        page = self._new_page(base_url)
+        page['body_text'] = []
+        target = _MetadataTarget(self, page)
+        try:
+            parser = etree.HTMLParser(target=target, encoding=self._charset(content_type))
+        except LookupError:
+            parser = etree.HTMLParser(target=target)
+        
+        try:
+            etree.fromstring(content, parser)
+        except (etree.XMLSyntaxError, ValueError):
+            pass  # Keep whatever was collected before the parser gave up
+        return page
+    
+    def _absolute_url(self, base_url, href):
+        """Resolve href against the page URL, skipping urljoin for already absolute URLs"""
+        if href.startswith(('http://', 'https://')):
+            return href
+        return urljoin(base_url, href)
+    
+    def _element_text(self, el):
+        """Stripped text of an element, skipping the subtree walk when it has no children"""
+        if len(el):
+            return el.text_content().strip()
+        return (el.text or '').strip()
+    
+    def _collect_title(self, el, page):
+        """Keep the first <title>"""
+        if page['title'] is None:
+            page['title'] = self._element_text(el)
+    
+    def _collect_meta(self, el, page):
+        """Index <meta> content by name, property and itemprop (first non-empty wins)"""
+        content = (el.get('content') or '').strip()
+        if not content:
+            return
+        for attr in ('name', 'property', 'itemprop'):
+            key = el.get(attr)
+            if key:
+                page[f'meta_{attr}'].setdefault(key, content)
+    
+    def _collect_link(self, el, page):
+        """Keep the first canonical <link>"""
+        if not page['canonical'] and 'canonical' in (el.get('rel') or '').split():
+            page['canonical'] = el.get('href', '')
+    
+    def _collect_heading(self, el, page):
+        """Extract headings (H1-H6)"""
+        text = self._element_text(el)
+        if text:
+            page['headings'][el.tag].append(text)
+    
+    def _collect_anchor(self, el, page):
+        """Extract links, up to MAX_LINKS"""
+        href = el.get('href')
+        if href is not None and len(page['links']) < self.MAX_LINKS:
+            page['links'].append({
+                'text': self._element_text(el),
+                'url': self._absolute_url(page['base_url'], href)
             })
-        return links[:50]  # Limit to first 50 links
-    
-    def _get_images(self, soup, base_url):
-        """Extract all images"""
-        images = []
-        for img in soup.find_all('img'):
-            src = img.get('src', '')
-            if src:
-                absolute_url = urljoin(base_url, src)
-                images.append({
-                    'src': absolute_url,
-                    'alt': img.get('alt', ''),
-                    'title': img.get('title', '')
-                })
-        return images[:20]  # Limit to first 20 images
-    
-    def _get_schema_org(self, soup):
+    
+    def _collect_image(self, el, page):
+        """Extract images, up to MAX_IMAGES"""
+        src = el.get('src', '')
+        if src and len(page['images']) < self.MAX_IMAGES:
+            page['images'].append({
+                'src': self._absolute_url(page['base_url'], src),
+                'alt': el.get('alt', ''),
+                'title': el.get('title', '')
+            })
+    
+    def _collect_script(self, el, page):
         """Extract Schema.org structured data"""
-        schema_data = []
-        scripts = soup.find_all('script', type='application/ld+json')
+        if el.get('type') != 'application/ld+json':
+            return
+        try:
+            page['schema_org'].append(orjson.loads(el.text))
+        except (orjson.JSONDecodeError, TypeError):
+            pass
+    
+    _COLLECTORS = {
+        'title': _collect_title,
+        'meta': _collect_meta,
+        'link': _collect_link,
+        'h1': _collect_heading,
+        'h2': _collect_heading,
+        'h3': _collect_heading,
+        'h4': _collect_heading,
+        'h5': _collect_heading,
+        'h6': _collect_heading,
+        'a': _collect_anchor,
+        'img': _collect_image,
+        'script': _collect_script,
+    }
+    
+    def crawl_multiple(self, urls, on_result=None):
+        """Crawl multiple URLs concurrently
         
-        for script in scripts:
-            try:
-                data = json.loads(script.string)
-                schema_data.append(data)
-            except (json.JSONDecodeError, AttributeError):
-                continue
+        Records are passed to on_result as soon as each page is done, so
+        callers can stream them out instead of holding the whole crawl in
+        memory. Without a callback the records are collected and returned.
+        Duplicate detection only compares pages within a single run.
+        """
+        self._reset_seen()
+        
+        if on_result is not None:
+            asyncio.run(self._crawl_async(urls, on_result))
+            return None
         
-        return schema_data
-    
-    def crawl_multiple(self, urls):
-        """Crawl multiple URLs concurrently"""
         results = []
+        asyncio.run(self._crawl_async(urls, results.append))
+        return results
+    
+    async def _crawl_async(self, urls, on_result):
+        """Crawl all URLs over a single shared aiohttp session"""
+        # Resolve hostnames with c-ares (aiodns) and keep them cached for the whole crawl
+        connector = aiohttp.TCPConnector(
+            limit=200,
+            limit_per_host=4,
+            resolver=aiohttp.AsyncResolver(),
+            ttl_dns_cache=600
+        )
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_url = {executor.submit(self.extract_metadata, url): url for url in urls}
-            
-            for future in as_completed(future_to_url):
-                url = future_to_url[future]
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.HEADERS) as session:
+            await self._dispatch(session, urls, on_result)
+    
+    async def _dispatch(self, session, urls, on_result):
+        """Start up to max_workers fetches at a time, always picking the host that is ready soonest
+        
+        URLs are read ahead into per-host queues (bounded by 64 * max_workers),
+        so while one host is rate limited, fetch slots go to other hosts instead
+        of sleeping on it.
+        """
+        slots = asyncio.Semaphore(self.max_workers)
+        running = set()
+        failures = []
+        pending = {}    # host -> URLs read but not started yet
+        ready_at = []   # heap of (time.monotonic() the host may be requested, host)
+        pending_count = 0
+        max_pending = 64 * self.max_workers
+        url_iter = iter(urls)
+        exhausted = False
+        
+        def finished(task):
+            running.discard(task)
+            slots.release()
+            if not task.cancelled() and task.exception() is not None:
+                failures.append(task.exception())
+        
+        while True:
+            while not exhausted and pending_count < max_pending:
                 try:
-                    result = future.result()
-                    results.append(result)
-                    time.sleep(self.delay)  # Rate limiting
-                except Exception as e:
-                    logging.error(f"Error processing {url}: {str(e)}")
-                    results.append({
-                        'url': url,
-                        'error': str(e),
-                        'scraped_at': datetime.now().isoformat()
-                    })
+                    url = next(url_iter)
+                except StopIteration:
+                    exhausted = True
+                    break
+                host = self._host_key(url)
+                if host not in pending:
+                    pending[host] = deque()
+                    heapq.heappush(ready_at, (self._host_next_ok.get(host, 0), host))
+                pending[host].append(url)
+                pending_count += 1
+            
+            if not ready_at:
+                break
+            
+            await slots.acquire()
+            if failures:
+                raise failures[0]
+            
+            # Only the dispatcher waits here, and only when no known host is ready yet
+            next_ok, host = ready_at[0]
+            await asyncio.sleep(max(0, next_ok - time.monotonic()))
+            heapq.heappop(ready_at)
+            
+            url = pending[host].popleft()
+            pending_count -= 1
+            wait = self._host_delay(url)  # Reserves the host's next slot
+            if pending[host]:
+                heapq.heappush(ready_at, (self._host_next_ok[host], host))
+            else:
+                del pending[host]
+            
+            task = asyncio.create_task(self._crawl_one(session, url, on_result, wait))
+            running.add(task)
+            task.add_done_callback(finished)
         
-        return results
+        while running:
+            await asyncio.wait(set(running))
+        if failures:
+            raise failures[0]
+    
+    async def _crawl_one(self, session, url, on_result, wait):
+        """Fetch one URL and hand its record to on_result"""
+        # One bad URL must never stop the rest of the crawl
+        try:
+            await asyncio.sleep(wait)  # Normally 0; the dispatcher already waited for the host
+            record = await self._fetch(session, url)
+        except Exception as e:
+            logging.error(f"Error processing {url}: {str(e)}")
+            record = self._error_record(url, e)
+        on_result(record)
+    
+    async def _fetch(self, session, url):
+        """Fetch a URL and parse it off the event loop"""
+        try:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                status_code = response.status
+                content_type = response.headers.get('Content-Type', '')
+                self._check_response(content_type, response.headers.get('Content-Length'))
+                
+                body = bytearray()
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    body += chunk
+                    self._check_size(len(body))
+                content = bytes(body)
+        except (aiohttp.ClientError, asyncio.TimeoutError, PageRejectedError) as e:
+            logging.error(f"Error scraping {url}: {str(e)}")
+            return self._error_record(url, e)
+        
+        # Parsing is CPU-bound, so keep it off the event loop
+        loop = asyncio.get_running_loop()
+        try:
+            metadata = await loop.run_in_executor(
+                None, self._parse_metadata, url, content, status_code, content_type
+            )
+        except Exception as e:
+            logging.error(f"Error processing {url}: {str(e)}")
+            return self._error_record(url, e)
+        
+        logging.info(f"Successfully scraped: {url}")
+        return metadata
+
+
+class ParquetResultWriter:
+    """Stream scraped records into a columnar Parquet file"""
+    
+    def __init__(self, filename='crawler_data.parquet', batch_size=500):
+        if pa is None:
+            raise ImportError("pyarrow is required for Parquet export")
+        
+        self.filename = filename
+        self.batch_size = batch_size
+        self.schema = self._build_schema()
+        self._rows = []
+        self._writer = pq.ParquetWriter(filename, self.schema)
+    
+    def _build_schema(self):
+        """Arrow schema for a scraped record; fields missing from a record are null"""
+        string_map = pa.map_(pa.string(), pa.string())
+        return pa.schema([
+            ('url', pa.string()),
+            ('title', pa.string()),
+            ('description', pa.string()),
+            ('keywords', pa.string()),
+            ('author', pa.string()),
+            ('publish_date', pa.string()),
+            ('og_data', string_map),
+            ('twitter_data', string_map),
+            ('canonical_url', pa.string()),
+            ('language', pa.string()),
+            ('headings', pa.struct([(f'h{i}', pa.list_(pa.string())) for i in range(1, 7)])),
+            ('links', pa.list_(pa.struct([('text', pa.string()), ('url', pa.string())]))),
+            ('images', pa.list_(pa.struct([('src', pa.string()), ('alt', pa.string()), ('title', pa.string())]))),
+            ('schema_org', pa.string()),  # Free-form JSON-LD, kept as serialized JSON
+            ('status_code', pa.int32()),
+            ('content_type', pa.string()),
+            ('duplicate_of', pa.string()),
+            ('error', pa.string()),
+            ('scraped_at', pa.timestamp('us')),
+        ])
+    
+    def write(self, record):
+        """Buffer a record, flushing a row group every batch_size records"""
+        row = dict(record)
+        for key in ('og_data', 'twitter_data'):
+            if key in row:
+                row[key] = list(row[key].items())
+        if 'schema_org' in row:
+            row['schema_org'] = orjson.dumps(row['schema_org'], option=orjson.OPT_NON_STR_KEYS).decode()
+        
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self._flush()
+    
+    def _flush(self):
+        """Write buffered records as one row group"""
+        if self._rows:
+            self._writer.write_table(pa.Table.from_pylist(self._rows, schema=self.schema))
+            self._rows = []
+    
+    def close(self):
+        """Flush remaining records and finalize the file"""
+        self._flush()
+        self._writer.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
 
 class PDFReportGenerator:
@@ -280,6 +863,15 @@ class PDFReportGenerator:
             fontSize=10,
             leading=14
         )
+        
+        # Label/value layout shared by every site's basic metadata table
+        self.details_table_style = TableStyle([
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (0, -1), 10),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 0.1*inch),
+        ])
     
     def generate_report(self, scraped_data):
         """Generate PDF report from scraped data"""
@@ -297,7 +889,7 @@ class PDFReportGenerator:
         
         # Detailed data for each site
         for idx, data in enumerate(scraped_data, 1):
-            self._add_site_details(data, idx)
+            self.story.extend(self._site_details(data, idx))
             if idx < len(scraped_data):
                 self.story.append(PageBreak())
         
@@ -315,7 +907,12 @@ class PDFReportGenerator:
         for idx, data in enumerate(scraped_data, 1):
             url = data.get('url', 'N/A')
             title = data.get('title', 'N/A')[:50]  # Truncate long titles
-            status = 'Success' if 'error' not in data else 'Failed'
+            if 'error' in data:
+                status = 'Failed'
+            elif 'duplicate_of' in data:
+                status = 'Duplicate'
+            else:
+                status = 'Success'
             
             table_data.append([str(idx), url[:40], title, status])
         
@@ -333,19 +930,24 @@ class PDFReportGenerator:
         
         self.story.append(table)
     
-    def _add_site_details(self, data, index):
-        """Add detailed information for a single site"""
+    def _site_details(self, data, index):
+        """Build the flowables with detailed information for a single site"""
+        story = []
         url = data.get('url', 'N/A')
         
-        self.story.append(Paragraph(f"Site #{index}: {url}", self.title_style))
-        self.story.append(Spacer(1, 0.2*inch))
+        story.append(Paragraph(f"Site #{index}: {escape(url)}", self.title_style))
+        story.append(Spacer(1, 0.2*inch))
         
         if 'error' in data:
-            self.story.append(Paragraph(f"<b>Error:</b> {data['error']}", self.normal_style))
-            return
+            story.append(Paragraph(f"<b>Error:</b> {escape(data['error'])}", self.normal_style))
+            return story
+        
+        if 'duplicate_of' in data:
+            story.append(Paragraph(f"<b>Duplicate of:</b> {escape(data['duplicate_of'])}", self.normal_style))
+            return story
         
         # Basic metadata
-        self.story.append(Paragraph("<b>Basic Metadata</b>", self.heading_style))
+        story.append(Paragraph("<b>Basic Metadata</b>", self.heading_style))
         basic_data = [
             ('Title', data.get('title', 'N/A')),
             ('Description', data.get('description', 'N/A')[:200]),
@@ -356,24 +958,32 @@ class PDFReportGenerator:
             ('Status Code', str(data.get('status_code', 'N/A'))),
         ]
         
-        for label, value in basic_data:
-            self.story.append(Paragraph(f"<b>{label}:</b> {value}", self.normal_style))
-            self.story.append(Spacer(1, 0.1*inch))
+        # One table instead of a markup Paragraph + Spacer per field; values are
+        # escaped up front so page text can't be misread as ReportLab markup
+        table_data = [
+            [f"{label}:", Paragraph(escape(value or ''), self.normal_style)]
+            for label, value in basic_data
+        ]
+        table = Table(table_data, colWidths=[1.3*inch, 5.2*inch])
+        table.setStyle(self.details_table_style)
+        story.append(table)
         
         # Headings
         if data.get('headings'):
-            self.story.append(Paragraph("<b>Headings</b>", self.heading_style))
+            story.append(Paragraph("<b>Headings</b>", self.heading_style))
             for level, headings in data['headings'].items():
                 if headings:
-                    self.story.append(Paragraph(f"<b>{level.upper()}:</b> {', '.join(headings[:3])}", self.normal_style))
+                    story.append(Paragraph(f"<b>{level.upper()}:</b> {escape(', '.join(headings[:3]))}", self.normal_style))
         
-        self.story.append(Spacer(1, 0.1*inch))
+        story.append(Spacer(1, 0.1*inch))
         
         # Links count
         links_count = len(data.get('links', []))
         images_count = len(data.get('images', []))
-        self.story.append(Paragraph(f"<b>Links Found:</b> {links_count}", self.normal_style))
-        self.story.append(Paragraph(f"<b>Images Found:</b> {images_count}", self.normal_style))
+        story.append(Paragraph(f"<b>Links Found:</b> {links_count}", self.normal_style))
+        story.append(Paragraph(f"<b>Images Found:</b> {images_count}", self.normal_style))
+        
+        return story
 
 
 def main():
@@ -402,8 +1012,18 @@ def main():
     # Initialize crawler
     crawler = WebCrawler(max_workers=10, timeout=30, delay=1)
     
-    # Crawl URLs
-    results = crawler.crawl_multiple(urls)
+    # Crawl URLs, streaming each record to JSON Lines (and Parquet when
+    # pyarrow is installed) as soon as it is ready
+    results = []
+    parquet_output = ParquetResultWriter('crawler_data.parquet') if pa is not None else nullcontext()
+    with open('crawler_data.jsonl', 'wb') as f, parquet_output as parquet_writer:
+        def save_result(record):
+            f.write(orjson.dumps(record, option=orjson.OPT_NON_STR_KEYS) + b'\n')
+            if parquet_writer is not None:
+                parquet_writer.write(record)
+            results.append(record)  # Kept for the PDF report
+        
+        crawler.crawl_multiple(urls, on_result=save_result)
     
     print(f"\nCrawling complete! Scraped {len(results)} sites.")
     
@@ -415,12 +1035,9 @@ def main():
     print("\n" + "=" * 60)
     print("Report generated successfully: crawler_report.pdf")
     print("=" * 60)
-    
-    # Also save as JSON for further processing
-    with open('crawler_data.json', 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
-    
-    print("Raw data saved to: crawler_data.json")
+    print("Raw data saved to: crawler_data.jsonl")
+    if parquet_writer is not None:
+        print("Columnar data saved to: crawler_data.parquet")
 
 
 if __name__ == "__main__":
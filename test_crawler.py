@@ -0,0 +1,301 @@
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import gzip
+import hashlib
+import random
+import threading
+import time
+
+import pytest
+
+import crawler as crawler_module
+from crawler import ParquetResultWriter, WebCrawler
+
+
+PAGE = (
+    b'<html lang="en"><head><title>Vertical\x0btab</title>'
+    b'<meta name="description" content="back\x08space">'
+    b'<meta property="og:title" content="OG\x01title">'
+    b'<script type="application/ld+json">{"@type": "Article"}</script></head>'
+    b'<body><h1>Heading\x0bone</h1><a href="/x">Link\x01text</a>'
+    b'<img src="i.png" alt="alt\x08text">'
+    b'%s</body></html>'
+)
+
+
+def _record(content, streaming):
+    crawler = WebCrawler()
+    crawler.STREAMING_PARSE_SIZE = 0 if streaming else len(content) + 1
+    record = crawler._parse_metadata('https://example.com/a', content, 200, 'text/html')
+    record.pop('scraped_at')
+    return record
+
+
+def test_streaming_matches_dom_with_control_characters():
+    content = PAGE % b''
+    dom = _record(content, streaming=False)
+    streamed = _record(content, streaming=True)
+
+    assert streamed == dom
+    assert dom['title'] == 'Vertical\x0btab'
+    assert dom['description'] == 'back\x08space'
+
+
+def test_streaming_matches_dom_on_large_page():
+    filler = b'<div><p>filler words <a href="/f">more</a></p></div>' * 30000
+    content = PAGE % filler
+    assert len(content) > WebCrawler.STREAMING_PARSE_SIZE
+
+    dom = _record(content, streaming=False)
+    streamed = WebCrawler()._parse_metadata('https://example.com/a', content, 200, 'text/html')
+    streamed.pop('scraped_at')
+
+    assert streamed == dom
+
+
+ARTICLE = ' '.join(f'word{chr(97 + i % 26)}{chr(97 + i // 26 % 26)}' for i in range(200))
+
+
+def _page(title, body):
+    return f'<html><head><title>{title}</title></head><body><p>{body}</p></body></html>'.encode()
+
+
+def test_near_duplicates_only_match_on_same_host():
+    crawler = WebCrawler()
+    crawler._parse_metadata('https://a.com/1', _page('A', ARTICLE + ' 2025'), 200, 'text/html')
+
+    same_host = crawler._parse_metadata('https://a.com/2', _page('A', ARTICLE + ' 2026'), 200, 'text/html')
+    other_host = crawler._parse_metadata('https://b.com/1', _page('B', ARTICLE + ' 2026'), 200, 'text/html')
+
+    assert same_host['duplicate_of'] == 'https://a.com/1'
+    assert 'duplicate_of' not in other_host
+
+
+def test_short_pages_are_not_near_duplicates():
+    crawler = WebCrawler()
+    shell = 'You need to enable JavaScript to run this app.'
+    crawler._parse_metadata('https://a.com/', _page('A', shell), 200, 'text/html')
+
+    record = crawler._parse_metadata('https://a.com/other', _page('Other', shell), 200, 'text/html')
+
+    assert 'duplicate_of' not in record
+
+
+def test_same_url_is_not_its_own_duplicate():
+    crawler = WebCrawler()
+    content = _page('A', ARTICLE)
+    crawler._parse_metadata('https://a.com/', content, 200, 'text/html')
+
+    record = crawler._parse_metadata('https://a.com/', content, 200, 'text/html')
+
+    assert record['title'] == 'A'
+    assert 'duplicate_of' not in record
+
+
+def _words(count, start):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return ' '.join(
+        letters[i % 26] + letters[i // 26 % 26] + letters[i // 676 % 26] + 'x'
+        for i in range(start, start + count)
+    )
+
+
+def test_short_articles_sharing_a_large_template_are_not_duplicates():
+    crawler = WebCrawler()
+    template = _words(1200, 0)
+    first, second = template + ' ' + _words(60, 21500), template + ' ' + _words(60, 22500)
+    # The template dominates both fingerprints, so only the identity check tells them apart
+    distance = bin(crawler._simhash([first]) ^ crawler._simhash([second])).count('1')
+    assert distance <= WebCrawler.SIMHASH_DISTANCE
+
+    crawler._parse_metadata('https://a.com/first', _page('First story', first), 200, 'text/html')
+    record = crawler._parse_metadata('https://a.com/second', _page('Second story', second), 200, 'text/html')
+
+    assert record['title'] == 'Second story'
+    assert 'duplicate_of' not in record
+
+
+def test_simhash_cost_stays_close_to_hashing_the_shingles():
+    rng = random.Random(0)
+    vocabulary = [''.join(rng.choices('abcdefghijklmnop', k=7)) for _ in range(3000)]
+    text = [' '.join(rng.choices(vocabulary, k=25000))]
+    crawler = WebCrawler()
+
+    def shingle_hashes():
+        tokens = text[0].split()
+        shingles = {' '.join(tokens[i:i + 3]) for i in range(len(tokens) - 2)}
+        return [hashlib.blake2b(shingle.encode(), digest_size=8).digest() for shingle in shingles]
+
+    def best_of(func):
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    # Bit counting used to take 64 Python passes over the hashes (~8x building and hashing the shingles)
+    assert best_of(lambda: crawler._simhash(text)) < 4 * best_of(shingle_hashes)
+
+
+def test_malformed_url_is_recorded_as_an_error():
+    crawler = WebCrawler(delay=0)
+
+    results = crawler.crawl_multiple(['http://[::1'])
+    record = crawler.extract_metadata('http://[::1')
+
+    assert len(results) == 1 and 'error' in results[0]
+    assert 'error' in record
+
+
+MAX_PAGE_SIZE = 10_000
+
+# Responses the crawler must reject, by path: (headers, body)
+REJECTED = {
+    '/pdf': ({'Content-Type': 'application/pdf', 'Content-Length': '8'}, b'%PDF-1.4'),
+    '/big': ({'Content-Type': 'text/html', 'Content-Length': str(2 * MAX_PAGE_SIZE)}, b'x' * 2 * MAX_PAGE_SIZE),
+    # No Content-Length: the HTTP/1.0 body runs until the connection closes
+    '/stream': ({'Content-Type': 'text/html'}, b'x' * 2 * MAX_PAGE_SIZE),
+    # About 130 bytes on the wire that decompress to ten times the cap
+    '/gzip': ({'Content-Type': 'text/html', 'Content-Encoding': 'gzip'}, gzip.compress(b'x' * 10 * MAX_PAGE_SIZE)),
+}
+
+
+class _PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path in REJECTED:
+            headers, body = REJECTED[self.path]
+        else:
+            body = _page(self.path, ARTICLE.replace('worda', self.path))
+            headers = {'Content-Type': 'text/html', 'Content-Length': str(len(body))}
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_port():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _PageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+
+
+def test_rate_limited_host_does_not_hold_up_other_hosts(server_port):
+    crawler = WebCrawler(max_workers=2, delay=0.5)
+    slow_host = [f'http://127.0.0.1:{server_port}/{i}' for i in range(4)]
+    other_host = f'http://localhost:{server_port}/other'
+    finished = []
+
+    crawler.crawl_multiple(slow_host + [other_host], on_result=lambda record: finished.append(record['url']))
+
+    assert sorted(finished) == sorted(slow_host + [other_host])
+    assert finished.index(other_host) < 2
+
+
+@pytest.mark.parametrize('path, error', [
+    ('/pdf', 'Unsupported content type: application/pdf'),
+    ('/big', f'Page exceeds {MAX_PAGE_SIZE} bytes'),
+    ('/stream', f'Page exceeds {MAX_PAGE_SIZE} bytes'),
+    ('/gzip', f'Page exceeds {MAX_PAGE_SIZE} bytes'),
+])
+def test_rejected_responses_are_recorded_as_errors(server_port, path, error):
+    crawler = WebCrawler(delay=0, max_page_size=MAX_PAGE_SIZE)
+    url = f'http://127.0.0.1:{server_port}{path}'
+
+    sync_record = crawler.extract_metadata(url)
+    async_record, = crawler.crawl_multiple([url])
+
+    assert sync_record['error'] == error
+    assert async_record['error'] == error
+
+
+def test_site_extractor_overrides_generic_fields(monkeypatch):
+    monkeypatch.setitem(crawler_module.EXTRACTORS, 'example.org', lambda tree, url: {'author': 'Site Author'})
+    content = _page('Generic title', ARTICLE)
+
+    record = WebCrawler()._parse_metadata('https://news.example.org/a', content, 200, 'text/html')
+
+    assert record['author'] == 'Site Author'
+    assert record['title'] == 'Generic title'
+    assert record['headings'] == {f'h{i}': [] for i in range(1, 7)}
+
+
+def test_complete_site_extractor_skips_generic_walk(monkeypatch):
+    complete = {field: f'site {field}' for field in WebCrawler.RECORD_FIELDS}
+    monkeypatch.setitem(crawler_module.EXTRACTORS, 'example.org', lambda tree, url: complete)
+    crawler = WebCrawler()
+    monkeypatch.setattr(crawler, '_collect', lambda tree, url: pytest.fail('generic walk ran'))
+
+    record = crawler._parse_metadata('https://example.org/a', _page('T', ARTICLE), 200, 'text/html')
+
+    assert {field: record[field] for field in WebCrawler.RECORD_FIELDS} == complete
+
+
+def test_arxiv_extractor_reads_citation_tags():
+    content = (
+        b'<html><head><title>[1706.03762] Attention Is All You Need</title>'
+        b'<meta name="citation_title" content="Attention Is All You Need">'
+        b'<meta name="citation_author" content="Vaswani, Ashish">'
+        b'<meta name="citation_author" content="Shazeer, Noam">'
+        b'<meta name="citation_date" content="2017/06/12">'
+        b'<meta name="citation_abstract" content="The dominant sequence transduction models...">'
+        b'</head><body><h1>Attention Is All You Need</h1></body></html>'
+    )
+
+    record = WebCrawler()._parse_metadata('https://arxiv.org/abs/1706.03762', content, 200, 'text/html')
+
+    assert record['title'] == 'Attention Is All You Need'
+    assert record['author'] == 'Vaswani, Ashish; Shazeer, Noam'
+    assert record['publish_date'] == '2017/06/12'
+    assert record['description'] == 'The dominant sequence transduction models...'
+    assert record['headings']['h1'] == ['Attention Is All You Need']
+
+
+def test_parquet_writer_round_trips_every_record_kind(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    crawler = WebCrawler()
+    content = (
+        b'<html><head><title>T</title>'
+        b'<meta property="og:title" content="OG title">'
+        b'<meta name="twitter:card" content="summary">'
+        b'<script type="application/ld+json">{"@type": "Article"}</script>'
+        b'</head><body><h1>Head</h1></body></html>'
+    )
+    records = [
+        crawler._parse_metadata('https://a.com/', content, 200, 'text/html'),
+        crawler._parse_metadata('https://a.com/copy', content, 200, 'text/html'),
+        crawler._error_record('https://b.com/', 'Connection refused'),
+    ]
+    path = tmp_path / 'records.parquet'
+
+    with ParquetResultWriter(str(path), batch_size=2) as writer:
+        for record in records:
+            writer.write(record)
+
+    table = pq.read_table(path)
+    rows = table.to_pylist()
+    assert pq.ParquetFile(path).num_row_groups == 2
+    assert [row['url'] for row in rows] == ['https://a.com/', 'https://a.com/copy', 'https://b.com/']
+
+    success, duplicate, error = rows
+    assert dict(success['og_data']) == {'og:title': 'OG title'}
+    assert dict(success['twitter_data']) == {'twitter:card': 'summary'}
+    assert success['schema_org'] == '[{"@type":"Article"}]'
+    assert success['headings']['h1'] == ['Head']
+    assert success['duplicate_of'] is None and success['error'] is None
+
+    assert duplicate['duplicate_of'] == 'https://a.com/'
+    assert duplicate['title'] is None and duplicate['og_data'] is None
+
+    assert error['error'] == 'Connection refused'
+    assert error['status_code'] is None and error['links'] is None
+
+    assert str(table.schema.field('scraped_at').type) == 'timestamp[us]'
+    assert isinstance(error['scraped_at'], datetime)